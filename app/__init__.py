@@ -1,15 +1,34 @@
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask
 from app.config import Config
+from app.utils.libreoffice_pool import listener_pool
+from app.utils.download_store import create_download_store
 
 
 app = Flask(__name__)
 app.config.from_object(Config)
 Config.init_app(app)
 
-# Store active downloads
-app.downloads = {}
+# Store active downloads and their conversion status (Redis when REDIS_URL is set)
+app.download_store = create_download_store(Config)
 
-# Store conversion status per task
-app.conversion_status = {}
+def init_converters(workers, queued):
+    """Background conversions: one thread per LibreOffice listener in this process plus a bounded backlog"""
+    app.converter_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='converter')
+    app.converter_slots = threading.BoundedSemaphore(workers + queued)
+    atexit.register(app.converter_pool.shutdown, wait=True)
+
+# Sized for a single process; gunicorn workers resize to their share (see gunicorn.conf.py)
+init_converters(Config.LIBREOFFICE_WORKERS, Config.MAX_QUEUED_CONVERSIONS)
+
+# Long-lived /events streams, capped so they cannot occupy every server thread
+app.sse_slots = threading.BoundedSemaphore(Config.MAX_SSE_STREAMS)
+
+# Warm LibreOffice listeners; started by the serving process (see run.py)
+app.libreoffice_pool = listener_pool
+# Listeners run in their own sessions and would outlive this process otherwise
+atexit.register(listener_pool.stop)
 
 from app import routes
\ No newline at end of file
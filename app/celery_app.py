@@ -0,0 +1,92 @@
+from pathlib import Path
+import logging
+import time
+from billiard.process import current_process
+from celery import Celery
+from celery.result import AsyncResult
+from celery.signals import worker_process_init, worker_process_shutdown
+from app.config import Config
+from app.utils.conversion import convert_to_pdf, ConversionError
+from app.utils.libreoffice_pool import listener_pool
+
+logger = logging.getLogger(__name__)
+
+# Start a converter worker with:
+#   celery -A app.celery_app worker -Q libreoffice_queue
+# Workers must share UPLOAD_FOLDER and CONVERTED_FOLDER with the web process.
+celery = Celery('pdf', broker=Config.CELERY_BROKER_URL, backend=Config.CELERY_RESULT_BACKEND)
+celery.conf.update(
+    task_routes={'app.celery_app.convert_task': {'queue': 'libreoffice_queue'}},
+    # One task per warm LibreOffice listener
+    worker_concurrency=Config.LIBREOFFICE_WORKERS,
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    task_track_started=True,
+)
+
+
+@worker_process_init.connect
+def start_listener(**kwargs):
+    # Each prefork child runs one task at a time, so it needs a single warm
+    # listener with a profile of its own, apart from the web workers' profiles
+    listener_pool.size = 1
+    listener_pool.profile_prefix = "celery_"
+    listener_pool.first_index = current_process().index
+    listener_pool.start()
+
+
+@worker_process_shutdown.connect
+def stop_listener(**kwargs):
+    listener_pool.stop()
+
+
+@celery.task(bind=True)
+def convert_task(self, upload_path, pdf_path, download_id, cache_key):
+    """Convert an uploaded file in a worker process and report progress through the result backend"""
+    from app import app
+    from app.utils.file_handling import cleanup_file, cache_pdf
+
+    self.update_state(state='PROGRESS', meta={'status': 'processing', 'message': 'Conversion in progress...'})
+    with app.app_context():
+        try:
+            convert_to_pdf(upload_path, pdf_path)
+            logger.info(f"Converted {Path(upload_path).name} successfully")
+            cache_pdf(Path(pdf_path), cache_key)
+            status = {'status': 'completed', 'message': 'Conversion successful.', 'size': Path(pdf_path).stat().st_size}
+        except ConversionError as e:
+            logger.error(f"Conversion failed: {e}")
+            status = {'status': 'failed', 'message': str(e)}
+        except Exception as e:
+            logger.error(f"Background conversion error: {e}")
+            status = {'status': 'failed', 'message': 'Unexpected error occurred during conversion.'}
+        finally:
+            cleanup_file(Path(upload_path))
+
+        # A shared store lets /status skip the result backend entirely
+        if app.download_store.shared:
+            app.download_store.update(download_id, **status)
+        return status
+
+
+def task_status(download_id):
+    """Map the Celery task state for a download onto the status dict used by the routes"""
+    result = AsyncResult(download_id, app=celery)
+    if result.successful():
+        return result.result
+    if result.failed():
+        return {'status': 'failed', 'message': 'Unexpected error occurred during conversion.'}
+    if result.state == 'PROGRESS':
+        return result.info
+    return {'status': 'processing', 'message': 'Conversion in progress...'}
+
+
+def finished_tasks(task_ids, interval=0.5):
+    """Yield (task_id, status dict) for the given tasks in the order they finish"""
+    pending = list(task_ids)
+    while pending:
+        for task_id in list(pending):
+            if AsyncResult(task_id, app=celery).ready():
+                pending.remove(task_id)
+                yield task_id, task_status(task_id)
+        if pending:
+            time.sleep(interval)
@@ -1,17 +1,28 @@
 import os
+import logging
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 class Config:
     BASE_DIR = Path(__file__).parent.parent
     UPLOAD_FOLDER = BASE_DIR / 'uploads'
     CONVERTED_FOLDER = BASE_DIR / 'converted'
     TEMP_FOLDER = BASE_DIR / 'temp'
+    PDF_CACHE_FOLDER = BASE_DIR / 'cache'
+    PDF_CACHE_MAX_ENTRIES = int(os.environ.get('PDF_CACHE_MAX_ENTRIES', 500))
 
     SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
     ALLOWED_EXTENSIONS = {'txt', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'html', 'htm', 'odt', 'rtf'}
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB
     MAX_FILE_SIZE_MB = 100
 
+    # Let a front server that understands X-Sendfile (Apache, lighttpd) transmit downloads
+    USE_X_SENDFILE = os.environ.get("USE_X_SENDFILE", "").lower() == "true"
+
+    # Internal nginx location aliased to CONVERTED_FOLDER (e.g. "/protected/"); see deploy/nginx.conf
+    X_ACCEL_REDIRECT_PREFIX = os.environ.get("X_ACCEL_REDIRECT_PREFIX")
+
     # More reliable Docker detection (checks multiple indicators)
     IS_DOCKER = (
         os.path.exists("/.dockerenv") or 
@@ -30,6 +41,15 @@ class Config:
     if not WKHTMLTOPDF_PATH:
         WKHTMLTOPDF_PATH = "/usr/bin/wkhtmltopdf" if IS_DOCKER else r"D:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe"
 
+    # Optional Redis store shared by all web workers and Celery tasks
+    REDIS_URL = os.environ.get("REDIS_URL")
+    REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 20))
+    DOWNLOAD_TTL = int(os.environ.get("DOWNLOAD_TTL", 3600))  # seconds
+
+    # Optional Celery broker; conversions run in-process when unset
+    CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL")
+    CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
+
     # Timeout settings (in seconds)
     LIBREOFFICE_TIMEOUT = int(os.environ.get("LIBREOFFICE_TIMEOUT", 300))
     WKHTMLTOPDF_TIMEOUT_LARGE = int(os.environ.get("WKHTMLTOPDF_TIMEOUT", 90))
@@ -39,8 +59,31 @@ class Config:
     LIBREOFFICE_PROFILE_DIR = TEMP_FOLDER / "lo_profile"
     SAL_USE_VCLPLUGIN = "headless"  # Force headless mode
 
+    # Persistent LibreOffice listeners (one per worker) driven over UNO
+    LIBREOFFICE_WORKERS = int(os.environ.get("LIBREOFFICE_WORKERS", os.cpu_count() or 1))
+    LIBREOFFICE_STARTUP_TIMEOUT = int(os.environ.get("LIBREOFFICE_STARTUP_TIMEOUT", 60))
+    LIBREOFFICE_WATCHDOG_INTERVAL = int(os.environ.get("LIBREOFFICE_WATCHDOG_INTERVAL", 5))
+
+    # Conversions waiting beyond the running ones before uploads get a 503
+    MAX_QUEUED_CONVERSIONS = int(os.environ.get("MAX_QUEUED_CONVERSIONS", 20))
+    CONVERSION_RETRY_AFTER = int(os.environ.get("CONVERSION_RETRY_AFTER", 10))  # seconds
+
+    # Files accepted in one /convert/batch request
+    MAX_BATCH_FILES = int(os.environ.get("MAX_BATCH_FILES", 10))
+
+    # Interval between keep-alive comments on /events streams (seconds)
+    SSE_KEEPALIVE = int(os.environ.get("SSE_KEEPALIVE", 15))
+    # Open /events streams per process; each holds a server thread, so keep this
+    # below GUNICORN_THREADS. Further clients get a 503 and fall back to polling.
+    MAX_SSE_STREAMS = int(os.environ.get("MAX_SSE_STREAMS", 4))
+
     @classmethod
     def init_app(cls, app=None):
         """Initialize required directories"""
-        for folder in [cls.UPLOAD_FOLDER, cls.CONVERTED_FOLDER, cls.TEMP_FOLDER, cls.LIBREOFFICE_PROFILE_DIR]:
-            folder.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+        for folder in [cls.UPLOAD_FOLDER, cls.CONVERTED_FOLDER, cls.TEMP_FOLDER, cls.PDF_CACHE_FOLDER, cls.LIBREOFFICE_PROFILE_DIR]:
+            folder.mkdir(parents=True, exist_ok=True)
+
+        # Cached PDFs are hard-linked into CONVERTED_FOLDER, which only works within one filesystem
+        if cls.PDF_CACHE_FOLDER.stat().st_dev != cls.CONVERTED_FOLDER.stat().st_dev:
+            logger.warning(f"{cls.PDF_CACHE_FOLDER} is on a different filesystem than {cls.CONVERTED_FOLDER}; "
+                           f"cached PDFs will be copied")
\ No newline at end of file
@@ -1,21 +1,28 @@
-from flask import render_template, request, redirect, url_for, flash, send_file, jsonify
+from flask import render_template, request, redirect, url_for, flash, send_file, jsonify, Response, stream_with_context
 from app import app
 from pathlib import Path
 import uuid
-import threading
+import json
 from werkzeug.utils import secure_filename
+from concurrent.futures import as_completed
 from .utils.conversion import convert_to_pdf, ConversionError
-from .utils.file_handling import save_uploaded_file, cleanup_file
+from .utils.file_handling import save_uploaded_file, cleanup_file, restore_cached_pdf, cache_pdf, cleanup_all_temp_folders
 from .utils.validators import allowed_file
 import logging
 import os
-from flask import jsonify
-from app.utils.file_handling import cleanup_all_temp_folders
 
 logger = logging.getLogger(__name__)
 
-# Store conversion statuses
-app.conversion_status = {}
+# Settings read on every request, bound once instead of going through app.config
+CONVERTED_FOLDER = app.config['CONVERTED_FOLDER']
+CELERY_BROKER_URL = app.config['CELERY_BROKER_URL']
+CONVERSION_RETRY_AFTER = str(app.config['CONVERSION_RETRY_AFTER'])
+SSE_KEEPALIVE = app.config['SSE_KEEPALIVE']
+X_ACCEL_REDIRECT_PREFIX = app.config['X_ACCEL_REDIRECT_PREFIX']
+MAX_BATCH_FILES = app.config['MAX_BATCH_FILES']
+
+# os.path.join on a str is cheaper than Path / per request
+_CONVERTED = str(CONVERTED_FOLDER)
 
 @app.errorhandler(413)
 def request_entity_too_large(error):
@@ -43,33 +50,55 @@ def upload_file():
         cleanup_all_temp_folders()
 
         filename = secure_filename(file.filename)
-        upload_path = save_uploaded_file(file, filename)
-
         download_id = str(uuid.uuid4())
+        # Files are named after the download, so queued uploads with the same name never share them
+        upload_path, digest = save_uploaded_file(file, f"{download_id}_{filename}")
+        # Identical bytes with the same extension always convert to the same PDF
+        cache_key = f"{digest}-{Path(filename).suffix[1:].lower()}"
+
         pdf_filename = f"{Path(filename).stem}.pdf"
-        app.downloads[download_id] = pdf_filename
 
-                # Initialize status as 'processing' right away
-        app.conversion_status[download_id] = {'status': 'processing', 'message': 'Conversion in progress...'}
+        pdf_path = CONVERTED_FOLDER / f"{download_id}.pdf"
+        cached = restore_cached_pdf(cache_key, pdf_path)
+
+        # Shed load instead of queueing conversions without bound
+        in_process = not cached and not CELERY_BROKER_URL
+        if in_process and not app.converter_slots.acquire(blocking=False):
+            cleanup_file(upload_path)
+            response = jsonify({'error': 'Too many conversions in progress. Please try again shortly.'})
+            response.headers['Retry-After'] = CONVERSION_RETRY_AFTER
+            return response, 503
+
+        # Initialize status as 'processing' right away
+        app.download_store.create(download_id, pdf_filename)
 
         # Background conversion
         def background_task():
             with app.app_context():
                 try:
-                    pdf_path = app.config['CONVERTED_FOLDER'] / pdf_filename
                     if convert_to_pdf(upload_path, pdf_path):
                         logger.info(f"Converted {filename} successfully")
-                        app.conversion_status[download_id] = {'status': 'completed', 'message': 'Conversion successful.'}
+                        cache_pdf(pdf_path, cache_key)
+                        app.download_store.update(download_id, status='completed', message='Conversion successful.',
+                                                  size=pdf_path.stat().st_size)
                     cleanup_file(upload_path)
                 except ConversionError as e:
                     logger.error(f"Conversion failed: {e}")
-                    app.conversion_status[download_id] = {'status': 'failed', 'message': str(e)}
+                    app.download_store.update(download_id, status='failed', message=str(e))
                 except Exception as e:
                     logger.error(f"Background conversion error: {e}")
-                    app.conversion_status[download_id] = {'status': 'failed', 'message': 'Unexpected error occurred during conversion.'}
+                    app.download_store.update(download_id, status='failed', message='Unexpected error occurred during conversion.')
 
-        thread = threading.Thread(target=background_task)
-        thread.start()
+        if cached:
+            cleanup_file(upload_path)
+            app.download_store.update(download_id, status='completed', message='Conversion successful.',
+                                      size=pdf_path.stat().st_size)
+        elif CELERY_BROKER_URL:
+            from app.celery_app import convert_task
+            convert_task.apply_async(args=(str(upload_path), str(pdf_path), download_id, cache_key), task_id=download_id)
+        else:
+            future = app.converter_pool.submit(background_task)
+            future.add_done_callback(lambda _: app.converter_slots.release())
 
         return jsonify({
             'status': 'processing',
@@ -81,37 +110,195 @@ def upload_file():
         logger.error(f"Upload error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/convert/batch', methods=['POST'])
+def convert_batch():
+    """Convert several files at once, streaming each PDF back as a multipart/mixed part when it is ready"""
+    files = [file for file in request.files.getlist('files') if file.filename]
+    if not files:
+        return jsonify({'error': 'No selected file'}), 400
+    if len(files) > MAX_BATCH_FILES:
+        return jsonify({'error': f'At most {MAX_BATCH_FILES} files per batch'}), 400
+    if not all(allowed_file(file.filename) for file in files):
+        return jsonify({'error': 'Invalid file type'}), 400
+
+    # Every in-process file takes a conversion slot, as if it had been uploaded on its own
+    held = 0
+    if not CELERY_BROKER_URL:
+        while held < len(files) and app.converter_slots.acquire(blocking=False):
+            held += 1
+        if held < len(files):
+            for _ in range(held):
+                app.converter_slots.release()
+            response = jsonify({'error': 'Too many conversions in progress. Please try again shortly.'})
+            response.headers['Retry-After'] = CONVERSION_RETRY_AFTER
+            return response, 503
+
+    names = {}
+    digests = {}
+    try:
+        for file in files:
+            filename = secure_filename(file.filename)
+            # Prefixed so two files with the same name cannot overwrite each other
+            upload_path, digests[upload_path] = save_uploaded_file(file, f"{uuid.uuid4().hex}_{filename}")
+            names[upload_path] = f"{Path(filename).stem}.pdf"
+    except Exception as e:
+        logger.error(f"Batch upload error: {str(e)}")
+        for upload_path in names:
+            cleanup_file(upload_path)
+        for _ in range(held):
+            app.converter_slots.release()
+        return jsonify({'error': str(e)}), 500
+
+    if CELERY_BROKER_URL:
+        from app.celery_app import convert_task, finished_tasks
+        jobs = {}
+        for upload_path in names:
+            task_id = str(uuid.uuid4())
+            cache_key = f"{digests[upload_path]}-{upload_path.suffix[1:].lower()}"
+            pdf_path = CONVERTED_FOLDER / f"{upload_path.stem}.pdf"
+            convert_task.apply_async(args=(str(upload_path), str(pdf_path), task_id, cache_key), task_id=task_id)
+            jobs[task_id] = (upload_path, pdf_path)
+
+        def results():
+            for task_id, status in finished_tasks(jobs):
+                upload_path, pdf_path = jobs[task_id]
+                if status['status'] == 'completed':
+                    yield upload_path, pdf_path
+                else:
+                    yield upload_path, ConversionError(status['message'])
+    else:
+        # Queued on the shared converter pool, so batches count against the same worker limit
+        futures = {app.converter_pool.submit(convert_to_pdf, upload_path): upload_path for upload_path in names}
+        for future in futures:
+            future.add_done_callback(lambda _: app.converter_slots.release())
+
+        def results():
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except ConversionError as e:
+                    yield futures[future], e
+                except Exception as e:
+                    logger.error(f"Batch conversion error: {e}")
+                    yield futures[future], ConversionError('Unexpected error occurred during conversion.')
+
+    boundary = uuid.uuid4().hex
+    delivered = set()
+
+    def generate():
+        try:
+            for upload_path, result in results():
+                pdf_filename = names[upload_path]
+                if isinstance(result, ConversionError):
+                    logger.error(f"Batch conversion failed for {pdf_filename}: {result}")
+                    body = json.dumps({'filename': pdf_filename, 'error': str(result)})
+                    yield (f"--{boundary}\r\nContent-Type: application/json\r\n\r\n{body}\r\n").encode()
+                else:
+                    yield (f"--{boundary}\r\nContent-Type: application/pdf\r\n"
+                           f"Content-Disposition: attachment; filename=\"{pdf_filename}\"\r\n"
+                           f"Content-Length: {result.stat().st_size}\r\n\r\n").encode()
+                    with open(result, 'rb') as pdf:
+                        yield from iter(lambda: pdf.read(64 * 1024), b'')
+                    yield b"\r\n"
+                    cleanup_file(result)
+                delivered.add(upload_path)
+                cleanup_file(upload_path)
+            yield f"--{boundary}--\r\n".encode()
+        finally:
+            # A client that went away needs neither the conversions still queued nor their PDFs
+            if CELERY_BROKER_URL:
+                for upload_path, pdf_path in jobs.values():
+                    if upload_path not in delivered:
+                        pdf_path.unlink(missing_ok=True)
+            else:
+                for future, upload_path in futures.items():
+                    if upload_path not in delivered:
+                        future.cancel()
+                        # Runs now for finished conversions, or when a running one ends
+                        future.add_done_callback(_discard_batch_pdf)
+            for upload_path in names:
+                if upload_path.exists():
+                    cleanup_file(upload_path)
+
+    return Response(stream_with_context(generate()), mimetype=f'multipart/mixed; boundary={boundary}')
+
+def _discard_batch_pdf(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().unlink(missing_ok=True)
+
 @app.route('/status/<download_id>')
 def conversion_status(download_id):
-    if download_id not in app.downloads:
+    status_info = app.download_store.get(download_id)
+    if status_info is None:
         return jsonify({'error': 'Invalid download ID'}), 404
 
-    filename = app.downloads[download_id]
-    file_path = app.config['CONVERTED_FOLDER'] / filename
-    status_info = app.conversion_status.get(download_id, {'status': 'unknown', 'message': ''})
+    filename = status_info['filename']
+    if CELERY_BROKER_URL and not app.download_store.shared:
+        from app.celery_app import task_status
+        status_info = task_status(download_id)
 
-    return jsonify({
+    return jsonify(_status_payload(download_id, filename, status_info))
+
+@app.route('/events/<download_id>')
+def conversion_events(download_id):
+    """Stream status changes as Server-Sent Events instead of being polled"""
+    status_info = app.download_store.get(download_id)
+    # Celery results without a shared store can only be polled through /status
+    if status_info is None or (CELERY_BROKER_URL and not app.download_store.shared):
+        return jsonify({'error': 'Invalid download ID'}), 404
+
+    if not app.sse_slots.acquire(blocking=False):
+        # EventSource treats this as an error and the page polls /status instead
+        response = jsonify({'error': 'Too many open event streams'})
+        response.headers['Retry-After'] = CONVERSION_RETRY_AFTER
+        return response, 503
+
+    filename = status_info['filename']
+
+    def stream():
+        record = status_info
+        yield f"data: {json.dumps(_status_payload(download_id, filename, record))}\n\n"
+        while record is not None and record['status'] == 'processing':
+            record = app.download_store.wait(download_id, SSE_KEEPALIVE)
+            if record is None or record['status'] == 'processing':
+                yield ": keep-alive\n\n"
+            else:
+                yield f"data: {json.dumps(_status_payload(download_id, filename, record))}\n\n"
+
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(app.sse_slots.release)
+    return response
+
+def _status_payload(download_id, filename, status_info):
+    return {
         'status': status_info['status'],
         'message': status_info['message'],
         'filename': filename,
         'complete': status_info['status'] == 'completed',
         'download_url': url_for('download_file', download_id=download_id) if status_info['status'] == 'completed' else None
-    })
+    }
 
 @app.route('/success/<download_id>')
 def conversion_success(download_id):
-    if download_id not in app.downloads:
+    data = app.download_store.get(download_id)
+    if data is None:
         flash('Invalid download ID')
         return redirect(url_for('home'))
 
-    filename = app.downloads[download_id]
-    file_path = app.config['CONVERTED_FOLDER'] / filename
+    filename = data['filename']
 
-    if not file_path.exists():
-        flash('File not ready yet')
-        return redirect(url_for('home'))
+    # Size is recorded when the conversion completes, so the page needs no stat()
+    if 'size' in data:
+        size = int(data['size'])
+    else:
+        file_path = os.path.join(_CONVERTED, f"{download_id}.pdf")
+        if not os.path.exists(file_path):
+            flash('File not ready yet')
+            return redirect(url_for('home'))
+        size = os.path.getsize(file_path)
 
-    file_size = f"{os.path.getsize(file_path) / (1024 * 1024):.2f} MB"
+    file_size = f"{size / (1024 * 1024):.2f} MB"
 
     return render_template('success.html',
                            download_id=download_id,
@@ -120,23 +307,43 @@ def conversion_success(download_id):
 
 @app.route('/download/<download_id>')
 def download_file(download_id):
-    if download_id not in app.downloads:
+    data = app.download_store.get(download_id)
+    if data is None:
         flash('Invalid download ID')
         return redirect(url_for('home'))
 
-    filename = app.downloads[download_id]
-    file_path = app.config['CONVERTED_FOLDER'] / filename
+    filename = data['filename']
+
+    # Let nginx stream the file and release this worker immediately
+    accel_prefix = X_ACCEL_REDIRECT_PREFIX
+    if accel_prefix:
+        response = Response(headers={
+            'X-Accel-Redirect': f"{accel_prefix.rstrip('/')}/{download_id}.pdf",
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Content-Type': 'application/pdf'
+        })
+        return _secure_download(response)
+
+    file_path = os.path.join(_CONVERTED, f"{download_id}.pdf")
 
     try:
         response = send_file(
-            str(file_path),
+            file_path,
             as_attachment=True,
             download_name=filename,
-            mimetype='application/pdf'
+            mimetype='application/pdf',
+            # Range and If-Modified-Since still work; only the ETag checksum pass is skipped
+            conditional=True,
+            etag=False
         )
-        response.headers['X-Content-Type-Options'] = 'nosniff'
-        response.headers['Content-Security-Policy'] = "default-src 'self'"
-        return response
+        return _secure_download(response)
     except Exception as e:
         flash(f'Download failed: {str(e)}')
         return redirect(url_for('home'))
+
+def _secure_download(response):
+    # PDFs are swept once their download expires, so the browser revalidates (Last-Modified) before reusing a copy
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = "default-src 'self'"
+    return response
@@ -103,6 +103,38 @@ document.addEventListener("DOMContentLoaded", function () {
   function monitorConversion(downloadId) {
     statusMessage.textContent = "Converting file...";
 
+    if (!window.EventSource) {
+      pollStatus(downloadId);
+      return;
+    }
+
+    // One server-sent event stream instead of repeated /status polls
+    const source = new EventSource(`/events/${downloadId}`);
+    const progressTimer = setInterval(advanceProgress, 2000);
+    let finished = false;
+
+    source.onmessage = function (event) {
+      const data = JSON.parse(event.data);
+      if (data.status !== "processing") {
+        finished = true;
+        clearInterval(progressTimer);
+        source.close();
+        handleStatus(downloadId, data);
+      }
+    };
+
+    source.onerror = function () {
+      // Fall back to polling if the stream is unavailable or drops
+      if (!finished) {
+        finished = true;
+        clearInterval(progressTimer);
+        source.close();
+        pollStatus(downloadId);
+      }
+    };
+  }
+
+  function pollStatus(downloadId) {
     function checkStatus() {
       fetch(`/status/${downloadId}`)
         .then((response) => {
@@ -112,24 +144,11 @@ document.addEventListener("DOMContentLoaded", function () {
           return response.json();
         })
         .then((data) => {
-          if (data.status === "completed") {
-            progressBar.style.width = "100%";
-            statusMessage.textContent = "Conversion complete!";
-            setTimeout(() => {
-              window.location.href = `/success/${downloadId}`;
-            }, 1000);
-          } else if (data.status === "failed") {
-            // Use the detailed message sent from backend
-            handleError(
-              data.message || "Conversion failed due to unknown error."
-            );
-          } else if (data.status === "processing") {
-            const currentWidth = parseInt(progressBar.style.width) || 0;
-            const newWidth = Math.min(currentWidth + 5, 95);
-            progressBar.style.width = newWidth + "%";
+          if (data.status === "processing") {
+            advanceProgress();
             setTimeout(checkStatus, 2000);
           } else {
-            handleError("Unknown conversion status.");
+            handleStatus(downloadId, data);
           }
         })
         .catch((error) => {
@@ -140,6 +159,27 @@ document.addEventListener("DOMContentLoaded", function () {
     checkStatus();
   }
 
+  function advanceProgress() {
+    const currentWidth = parseInt(progressBar.style.width) || 0;
+    const newWidth = Math.min(currentWidth + 5, 95);
+    progressBar.style.width = newWidth + "%";
+  }
+
+  function handleStatus(downloadId, data) {
+    if (data.status === "completed") {
+      progressBar.style.width = "100%";
+      statusMessage.textContent = "Conversion complete!";
+      setTimeout(() => {
+        window.location.href = `/success/${downloadId}`;
+      }, 1000);
+    } else if (data.status === "failed") {
+      // Use the detailed message sent from backend
+      handleError(data.message || "Conversion failed due to unknown error.");
+    } else {
+      handleError("Unknown conversion status.");
+    }
+  }
+
   function handleError(message) {
     statusMessage.textContent = "Error: " + message;
     progressBar.style.backgroundColor = "#dc3545"; // red bar
@@ -1,14 +1,28 @@
 import os
-import time
+import asyncio
+import atexit
+import html
+import threading
 import subprocess
 import signal
+import selectors
 from pathlib import Path
 import shutil
+import tempfile
 import logging
 import magic
 import shlex
-from typing import Optional, Union
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator, Optional, Tuple, Union
 from app.config import Config
+from app.utils.libreoffice_pool import listener_pool, PoolError
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+except ImportError:  # Plain text then goes through the HTML route
+    canvas = None
 
 logger = logging.getLogger(__name__)
 
@@ -40,34 +54,71 @@ SUPPORTED_TYPES = {
     'odt': ['application/vnd.oasis.opendocument.text'],
     'rtf': ['text/rtf', 'application/rtf']
 }
+SUPPORTED_TYPES = {ext: frozenset(mimes) for ext, mimes in SUPPORTED_TYPES.items()}
+# Every accepted (extension, detected MIME) combination, checked with one hash lookup
+_VALID_PAIRS = frozenset((ext, mime) for ext, mimes in SUPPORTED_TYPES.items() for mime in mimes)
+_VALID_EXTS = frozenset(SUPPORTED_TYPES)
+# Rendered as text/markup whatever their bytes are, so sniffing them cannot reject anything useful
+_UNSNIFFED_EXTS = frozenset({'txt', 'html', 'htm'})
+
+# OLE2 compound file header used by legacy Office formats. libmagic only reports
+# application/x-ole-storage for it unless it sees the directory sector, often past the sniffed head
+_OLE_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+# Leading bytes that identify a format outright; anything else goes through libmagic
+_EXT_FAST_SIGS = {
+    'doc': _OLE_SIGNATURE,
+    'xls': _OLE_SIGNATURE,
+    'docx': b'PK\x03\x04',
+    'xlsx': b'PK\x03\x04',
+    'rtf': b'{\\rtf',
+}
 
-def _kill_libreoffice_processes():
-    """Forcefully terminate any running LibreOffice processes"""
-    try:
-        if os.name == 'nt':  # Windows
-            subprocess.run(['taskkill', '/F', '/IM', 'soffice.exe', '/T'],
-                          check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        else:  # Unix-like
-            subprocess.run(['pkill', '-f', 'soffice'],
-                          check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except subprocess.CalledProcessError:
-        pass  # No processes to kill is fine
+# Text files above this size are rendered in a subprocess and paged for wkhtmltopdf
+_LARGE_TEXT_BYTES = 10 * 1024 * 1024
+
+# Avoid allocating a console window for every child process on Windows
+_NO_WINDOW = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+# Resolved once at import; installing wkhtmltopdf requires a restart to take effect
+_WKHTMLTOPDF_AVAILABLE = bool(Config.WKHTMLTOPDF_PATH and Path(Config.WKHTMLTOPDF_PATH).is_file())
+
+# libmagic handles are not thread-safe, so each thread loads the database once
+_magic_local = threading.local()
+
+def _mime_detector():
+    detector = getattr(_magic_local, 'detector', None)
+    if detector is None:
+        detector = _magic_local.detector = magic.Magic(mime=True)
+    return detector
+
+# Set after the first successful check; the installation does not change while running
+_LIBREOFFICE_READY = False
+_LIBREOFFICE_READY_LOCK = threading.Lock()
 
 def _check_libreoffice_ready():
-    """Verify LibreOffice is installed and runnable"""
-    if not Path(Config.LIBREOFFICE_PATH).exists():
-        raise ConversionError(f"LibreOffice not found at {Config.LIBREOFFICE_PATH}")
-    
-    try:
-        subprocess.run(
-            [Config.LIBREOFFICE_PATH, "--version"],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=10
-        )
-    except Exception as e:
-        raise ConversionError(f"LibreOffice check failed: {str(e)}")
+    """Verify once per process that LibreOffice is installed and runnable"""
+    global _LIBREOFFICE_READY
+    if _LIBREOFFICE_READY:
+        return
+
+    with _LIBREOFFICE_READY_LOCK:
+        if _LIBREOFFICE_READY:
+            return
+        if not Path(Config.LIBREOFFICE_PATH).exists():
+            raise ConversionError(f"LibreOffice not found at {Config.LIBREOFFICE_PATH}")
+
+        try:
+            subprocess.run(
+                [Config.LIBREOFFICE_PATH, "--version"],
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=10
+            )
+        except Exception as e:
+            raise ConversionError(f"LibreOffice check failed: {str(e)}")
+        _LIBREOFFICE_READY = True
 
 def _validate_file(input_path: Path) -> None:
     """Enhanced file validation with better error messages"""
@@ -84,15 +135,6 @@ def _validate_file(input_path: Path) -> None:
                 "Check file permissions or try a different file"
             )
 
-        # Check for file stability
-        initial_size = input_path.stat().st_size
-        time.sleep(0.5)
-        if input_path.stat().st_size != initial_size:
-            raise ConversionError(
-                "File size changed during validation",
-                "The file might still be uploading or being modified"
-            )
-
         # File type validation
         ext = input_path.suffix[1:].lower()
         if not ext:
@@ -101,19 +143,27 @@ def _validate_file(input_path: Path) -> None:
                 "Add the correct file extension or try a different file"
             )
 
-        if ext not in SUPPORTED_TYPES:
+        if ext not in _VALID_EXTS:
             raise ConversionError(
                 f"Unsupported file extension: .{ext}",
                 f"Supported formats: {', '.join(SUPPORTED_TYPES.keys())}"
             )
 
-        mime = magic.Magic(mime=True)
-        detected_mime = mime.from_file(str(input_path)).lower()
+        if ext in _UNSNIFFED_EXTS:
+            return
+
+        # The signatures libmagic matches on sit in the first few KiB
+        with open(input_path, 'rb') as fh:
+            head = fh.read(4096)
+
+        signature = _EXT_FAST_SIGS.get(ext)
+        if signature is not None and head.startswith(signature):
+            return
 
-        if detected_mime == 'application/zip' and ext in ['docx', 'xlsx']:
-            return  # Skip further validation for zip-based formats
+        detected_mime = _mime_detector().from_buffer(head).lower()
 
-        if detected_mime not in SUPPORTED_TYPES[ext]:
+        # application/zip is listed for docx and xlsx, so zip containers pass here too
+        if (ext, detected_mime) not in _VALID_PAIRS:
             raise ConversionError(
                 f"File content doesn't match extension. Detected: {detected_mime}",
                 "The file might be corrupted or mislabeled"
@@ -130,34 +180,72 @@ def _validate_file(input_path: Path) -> None:
             "The file might be corrupted or in an unsupported format"
         )
 
-def _run_command(command: list, timeout: int, shell: bool = False, env: Optional[dict] = None) -> None:
-    """Robust command execution with process cleanup"""
-    process = None
+def _wait(process: subprocess.Popen, timeout: int) -> int:
+    """Wait for the process to exit, through a pidfd on Linux instead of polling waitpid"""
+    try:
+        pidfd = os.pidfd_open(process.pid)
+    except (AttributeError, OSError):  # not Linux 5.3+
+        return process.wait(timeout=timeout)
+
+    try:
+        with selectors.DefaultSelector() as selector:
+            selector.register(pidfd, selectors.EVENT_READ)
+            if not selector.select(timeout):
+                raise subprocess.TimeoutExpired(process.args, timeout)
+    finally:
+        os.close(pidfd)
+    return process.wait()
+
+def _feed_stdin(process: subprocess.Popen, stdin_writer, errors: list) -> None:
     try:
-        _kill_libreoffice_processes()
+        stdin_writer(process.stdin)
+    except BrokenPipeError:
+        pass  # the command exited early; its return code reports why
+    except Exception as e:
+        errors.append(e)  # e.g. the input file vanished; re-raised by _run_command
+    finally:
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
 
+def _run_command(command: list, timeout: int, env: Optional[dict] = None, stdin_writer=None) -> None:
+    """Robust command execution with process cleanup; stdin_writer(pipe) feeds the command's stdin"""
+    process = None
+    feeder = None
+    feed_errors = []
+    # stderr goes to a temp file that is only read if the command fails
+    stderr_file = tempfile.TemporaryFile()
+    try:
         process = subprocess.Popen(
             command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            shell=shell,
+            stdin=subprocess.PIPE if stdin_writer else subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr_file,
             start_new_session=True,
-            env=env or os.environ
+            env=env or os.environ,
+            creationflags=_NO_WINDOW
         )
 
-        stdout, stderr = process.communicate(timeout=timeout)
+        # Fed from a thread so a stalled reader still hits the timeout
+        if stdin_writer:
+            feeder = threading.Thread(target=_feed_stdin, args=(process, stdin_writer, feed_errors), daemon=True)
+            feeder.start()
 
-        logger.debug(f"Command stdout: {stdout}")
-        if stderr:
-            logger.debug(f"Command stderr: {stderr}")
+        _wait(process, timeout)
+        if feeder:
+            feeder.join()
+        # Output made from partial input is not a successful conversion
+        if feed_errors:
+            raise feed_errors[0]
 
         if process.returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode('utf-8', 'replace')
             error_msg = (
                 f"Command failed (code {process.returncode}):\n"
                 f"Command: {shlex.join(command)}\n"
-                f"Stderr: {stderr.strip() or '(empty)'}\n"
-                f"Stdout: {stdout.strip() or '(empty)'}"
+                f"Stderr: {stderr.strip() or '(empty)'}"
             )
             logger.error(error_msg)
             raise ConversionError(error_msg)
@@ -168,7 +256,8 @@ def _run_command(command: list, timeout: int, shell: bool = False, env: Optional
                 os.killpg(os.getpgid(process.pid), signal.SIGKILL)
                 process.wait(timeout=5)
             except Exception:
-                _kill_libreoffice_processes()
+                # No process groups (Windows); kill just this child, never other conversions
+                process.kill()
         raise ConversionError(
             f"Command timed out after {timeout} seconds",
             "The document might be too complex. Try simplifying it."
@@ -183,28 +272,37 @@ def _run_command(command: list, timeout: int, shell: bool = False, env: Optional
         raise ConversionError(f"Command execution failed: {str(e)}")
 
     finally:
+        stderr_file.close()
         if process and process.poll() is None:
             try:
                 process.terminate()
             except Exception:
                 pass
 
+def _advise_sequential(f) -> None:
+    """Ask the kernel for aggressive readahead on a file read once front to back"""
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+# Per-line <div> writes are small; batch them into fewer write() syscalls
+_HTML_WRITE_BUFFER = 64 * 1024
+
 def _create_temp_html(input_path: Path) -> Path:
     """Create a temporary HTML file from text content"""
     html_path = Config.TEMP_FOLDER / f"{input_path.stem}.html"
     try:
-        with open(input_path, 'r', encoding='utf-8', errors='replace') as f:
-            content = f.read()
-
-        lines = content.splitlines()
-        html_lines = "\n".join(f"<div>{line}</div>" for line in lines)
-
-        with open(html_path, 'w', encoding='utf-8') as f:
+        # Streamed line by line so memory stays flat regardless of input size
+        with open(input_path, 'r', encoding='utf-8', errors='replace') as f_in, \
+                open(html_path, 'w', encoding='utf-8', buffering=_HTML_WRITE_BUFFER) as f:
+            _advise_sequential(f_in)
             f.write(f"""<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
-    <title>{input_path.stem}</title>
+    <title>{html.escape(input_path.stem)}</title>
     <style>
         body {{
             margin: 1in;
@@ -220,8 +318,11 @@ def _create_temp_html(input_path: Path) -> Path:
     </style>
 </head>
 <body>
-    {html_lines}
-</body>
+""")
+            for line in f_in:
+                text = html.escape(line.rstrip('\n'), quote=False)
+                f.write(f"    <div>{text}</div>\n")
+            f.write("""</body>
 </html>""")
 
         return html_path
@@ -230,22 +331,21 @@ def _create_temp_html(input_path: Path) -> Path:
         html_path.unlink(missing_ok=True)
         raise ConversionError(f"Failed to create HTML file: {str(e)}")
 
-def _try_libreoffice_conversion(input_path: Path, output_path: Path) -> None:
-    """Direct LibreOffice conversion attempt with isolated profile"""
-    profile_path = Config.TEMP_FOLDER / f"lo_profile_{os.getpid()}_{int(time.time())}"
-
-    try:
-        profile_path.mkdir(parents=True, exist_ok=True)
-
-        env = os.environ.copy()
-        env["SAL_USE_VCLPLUGIN"] = "headless"
-        env["HOME"] = str(profile_path)
+def _run_soffice(input_path: Path, output_path: Path, profile_path: Path) -> None:
+    """Run one standalone soffice conversion using the given profile"""
+    env = os.environ.copy()
+    env["SAL_USE_VCLPLUGIN"] = "headless"
 
+    # soffice names its output after the input; a private outdir keeps it off any other file of that
+    # name, and being next to output_path keeps the final os.replace on one filesystem
+    with tempfile.TemporaryDirectory(dir=output_path.parent, prefix='.soffice-') as outdir:
         command = [
             Config.LIBREOFFICE_PATH,
             "--headless",
+            # A profile of its own lets this run alongside other soffice instances
+            f"-env:UserInstallation={profile_path.as_uri()}",
             "--convert-to", "pdf:writer_pdf_Export",
-            "--outdir", str(output_path.parent),
+            "--outdir", outdir,
             str(input_path),
             "--norestore",
             "--nodefault",
@@ -253,31 +353,66 @@ def _try_libreoffice_conversion(input_path: Path, output_path: Path) -> None:
             "--writer",
         ]
 
-        logger.info(f"Attempting LibreOffice conversion: {' '.join(command)}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Attempting LibreOffice conversion: %s", shlex.join(command))
         _run_command(command, Config.LIBREOFFICE_TIMEOUT * 2, env=env)
 
-        output_pdf = output_path.parent / f"{input_path.stem}.pdf"
-        for _ in range(5):
-            if output_pdf.exists() and output_pdf.stat().st_size > 0:
-                logger.info(f"LibreOffice successfully created: {output_pdf}")
-                break
-            time.sleep(1)
-        else:
+        # soffice has exited by now, so the output is either complete or missing
+        output_pdf = Path(outdir) / f"{input_path.stem}.pdf"
+        try:
+            created = output_pdf.stat().st_size > 0
+        except FileNotFoundError:
+            created = False
+        if not created:
             raise ConversionError("LibreOffice conversion failed: Output file missing or empty")
+        os.replace(output_pdf, output_path)
+    logger.info(f"LibreOffice successfully created: {output_path}")
 
-    finally:
-        for _ in range(3):
-            try:
-                shutil.rmtree(profile_path, ignore_errors=True)
-                break
-            except Exception:
-                time.sleep(1)
+# Standalone soffice profiles reused by the thread that created them; removed at exit
+_THREAD_PROFILES = {}
+
+def _thread_profile() -> Path:
+    ident = threading.get_ident()
+    profile_path = _THREAD_PROFILES.get(ident)
+    if profile_path is None:
+        profile_path = _THREAD_PROFILES[ident] = Config.TEMP_FOLDER / f"lo_profile_{os.getpid()}_{ident}"
+    profile_path.mkdir(parents=True, exist_ok=True)
+    return profile_path
+
+def _remove_thread_profiles() -> None:
+    for profile_path in _THREAD_PROFILES.values():
+        shutil.rmtree(profile_path, ignore_errors=True)
+
+atexit.register(_remove_thread_profiles)
+
+def _try_libreoffice_conversion(input_path: Path, output_path: Path) -> None:
+    """Direct LibreOffice conversion attempt with isolated profile"""
+    if listener_pool.profiles is not None:
+        # Warm profile kept across conversions, so soffice skips first-start setup
+        try:
+            with listener_pool.profiles.acquire(Config.LIBREOFFICE_TIMEOUT) as profile_path:
+                _run_soffice(input_path, output_path, profile_path)
+        except PoolError as e:
+            raise ConversionError(str(e))
+        return
+
+    # One thread runs one soffice at a time, so its profile is never shared concurrently
+    _run_soffice(input_path, output_path, _thread_profile())
 
 def convert_with_libreoffice(input_path: Path, output_path: Path) -> None:
-    """Use direct LibreOffice CLI conversion"""
-    _check_libreoffice_ready()
+    """Convert on a warm pooled listener, falling back to direct LibreOffice CLI conversion"""
     try:
-        _try_libreoffice_conversion(input_path, output_path)
+        # Every listener failing to launch falls back to the CLI rather than waiting out the timeout
+        if listener_pool.is_reachable():
+            logger.info(f"Converting {input_path.name} on pooled LibreOffice listener")
+            try:
+                listener_pool.convert(input_path, output_path)
+            except PoolError as e:
+                raise ConversionError(str(e))
+        else:
+            _check_libreoffice_ready()
+            _try_libreoffice_conversion(input_path, output_path)
+
         if not output_path.exists() or output_path.stat().st_size == 0:
             raise ConversionError("Conversion succeeded but output file is empty")
     except ConversionError as e:
@@ -287,12 +422,15 @@ def convert_with_libreoffice(input_path: Path, output_path: Path) -> None:
 def convert_with_wkhtmltopdf(input_path: Path, output_path: Path) -> None:
     """Optimized wkhtmltopdf conversion"""
     try:
-        if not Path(Config.WKHTMLTOPDF_PATH).exists():
+        if not _WKHTMLTOPDF_AVAILABLE:
             raise ConversionError("wkhtmltopdf binary not found")
 
-        if input_path.suffix.lower() == '.txt' and input_path.stat().st_size > 10 * 1024 * 1024:
+        if input_path.suffix.lower() == '.txt' and input_path.stat().st_size > _LARGE_TEXT_BYTES:
             return _convert_large_text_with_wkhtmltopdf(input_path, output_path)
 
+        # Plain text is wrapped in <pre> on its way into stdin; no temporary HTML file
+        is_text = input_path.suffix.lower() == '.txt'
+
         command = [
             Config.WKHTMLTOPDF_PATH,
             "--print-media-type",
@@ -303,12 +441,14 @@ def convert_with_wkhtmltopdf(input_path: Path, output_path: Path) -> None:
             "--margin-bottom", "10mm",
             "--margin-left", "10mm",
             "--margin-right", "10mm",
-            str(input_path),
+            "-" if is_text else str(input_path),
             str(output_path)
         ]
 
-        logger.info(f"Attempting wkhtmltopdf conversion: {' '.join(command)}")
-        _run_command(command, Config.WKHTMLTOPDF_TIMEOUT_LARGE)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Attempting wkhtmltopdf conversion: %s", shlex.join(command))
+        _run_command(command, Config.WKHTMLTOPDF_TIMEOUT_LARGE,
+                     stdin_writer=(lambda pipe: _pipe_text_html(input_path, pipe)) if is_text else None)
 
         if not output_path.exists():
             raise ConversionError("wkhtmltopdf failed to create output file")
@@ -318,13 +458,43 @@ def convert_with_wkhtmltopdf(input_path: Path, output_path: Path) -> None:
     except Exception as e:
         raise ConversionError(f"wkhtmltopdf conversion failed: {str(e)}")
 
+def _escape_bytes(chunk: bytes) -> bytes:
+    """HTML-escape UTF-8 bytes without decoding; the escaped characters are all single-byte"""
+    return chunk.replace(b'&', b'&amp;').replace(b'<', b'&lt;').replace(b'>', b'&gt;')
+
+def _page_end(chunk: bytes) -> int:
+    """Where to end a page: after the last newline, else before a UTF-8 sequence split by the read"""
+    newline = chunk.rfind(b'\n')
+    if newline >= 0:
+        return newline + 1
+    cut = len(chunk)
+    while cut > 0 and chunk[cut - 1] & 0xC0 == 0x80:
+        cut -= 1
+    if cut > 0 and chunk[cut - 1] >= 0xC0:
+        cut -= 1
+    return cut or len(chunk)
+
+_PRE_START = b'<!DOCTYPE html><meta charset="utf-8"><pre style="white-space:pre-wrap;word-break:break-word;font-family:Arial,sans-serif;font-size:12px">'
+_PRE_END = b'</pre>'
+
+def _pipe_text_html(input_path: Path, pipe) -> None:
+    """Write a text file as escaped HTML to a pipe, a chunk of bytes at a time"""
+    with open(input_path, 'rb') as f_in:
+        _advise_sequential(f_in)
+        pipe.write(_PRE_START)
+        for chunk in iter(lambda: f_in.read(1024 * 1024), b''):
+            pipe.write(_escape_bytes(chunk))
+        pipe.write(_PRE_END)
+
 def _convert_large_text_with_wkhtmltopdf(input_path: Path, output_path: Path) -> None:
     """Special handling for very large text files"""
     html_path = Config.TEMP_FOLDER / f"{input_path.stem}_paged.html"
     try:
-        with open(input_path, 'r', encoding='utf-8', errors='replace') as f_in:
-            with open(html_path, 'w', encoding='utf-8') as f_out:
-                f_out.write("""<!DOCTYPE html>
+        # Copied as bytes: no decode/encode round trip, wkhtmltopdf handles any invalid UTF-8
+        with open(input_path, 'rb') as f_in:
+            with open(html_path, 'wb') as f_out:
+                _advise_sequential(f_in)
+                f_out.write(b"""<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -341,13 +511,19 @@ def _convert_large_text_with_wkhtmltopdf(input_path: Path, output_path: Path) ->
                 first_chunk = True
                 
                 while chunk:
+                    if len(chunk) == chunk_size:
+                        cut = _page_end(chunk)
+                        f_in.seek(cut - len(chunk), os.SEEK_CUR)
+                        chunk = chunk[:cut]
                     if not first_chunk:
-                        f_out.write('<div class="page-break"></div>')
-                    f_out.write(f'<pre>{chunk}</pre>')
+                        f_out.write(b'<div class="page-break"></div>')
+                    f_out.write(b'<pre>')
+                    f_out.write(_escape_bytes(chunk))
+                    f_out.write(b'</pre>')
                     chunk = f_in.read(chunk_size)
                     first_chunk = False
                 
-                f_out.write("</body></html>")
+                f_out.write(b"</body></html>")
 
         command = [
             Config.WKHTMLTOPDF_PATH,
@@ -374,6 +550,75 @@ def _convert_large_text_with_wkhtmltopdf(input_path: Path, output_path: Path) ->
     if not output_path.exists() or output_path.stat().st_size == 0:
         raise ConversionError("Failed to convert large text file")
 
+# Layout for text rendered directly with ReportLab's built-in Courier
+_TXT_FONT_SIZE = 10
+_TXT_LEADING = 12
+_TXT_MARGIN = 72  # 1 inch, in points
+
+def convert_txt_native(input_path: Path, output_path: Path) -> bool:
+    """Render plain text straight to PDF; returns False when it needs glyphs the built-in fonts lack"""
+    if canvas is None:
+        return False
+
+    width, height = A4
+    columns = int((width - 2 * _TXT_MARGIN) / (_TXT_FONT_SIZE * 0.6))  # Courier advance is 0.6 em
+    rows = int((height - 2 * _TXT_MARGIN) / _TXT_LEADING)
+
+    # Nothing is written to output_path until save(), so bailing out leaves no partial file
+    pdf = canvas.Canvas(str(output_path), pagesize=A4)
+    pdf.setTitle(input_path.stem)
+    text = None
+    row = rows
+    try:
+        with open(input_path, 'r', encoding='utf-8', errors='replace') as f:
+            _advise_sequential(f)
+            for line in f:
+                line = line.rstrip('\n').expandtabs(8)
+                line.encode('cp1252')  # the standard PDF fonts only cover WinAnsi
+                for start in range(0, max(len(line), 1), columns):
+                    if row == rows:
+                        if text is not None:
+                            pdf.drawText(text)
+                            pdf.showPage()
+                        text = pdf.beginText(_TXT_MARGIN, height - _TXT_MARGIN - _TXT_FONT_SIZE)
+                        text.setFont("Courier", _TXT_FONT_SIZE, _TXT_LEADING)
+                        row = 0
+                    text.textLine(line[start:start + columns])
+                    row += 1
+    except UnicodeEncodeError:
+        return False
+
+    if text is not None:
+        pdf.drawText(text)
+    pdf.save()
+    return True
+
+def _convert_html(input_path: Path, output_path: Path) -> None:
+    if _WKHTMLTOPDF_AVAILABLE:
+        convert_with_wkhtmltopdf(input_path, output_path)
+    else:
+        convert_with_libreoffice(input_path, output_path)
+
+def _convert_txt(input_path: Path, output_path: Path) -> None:
+    # ReportLab runs in this process under the GIL and without a timeout, so only small files use it
+    if input_path.stat().st_size <= _LARGE_TEXT_BYTES and convert_txt_native(input_path, output_path):
+        return
+    if _WKHTMLTOPDF_AVAILABLE:
+        convert_with_wkhtmltopdf(input_path, output_path)
+        return
+    html_path = _create_temp_html(input_path)
+    try:
+        _convert_html(html_path, output_path)
+    finally:
+        html_path.unlink(missing_ok=True)
+
+# Converters by suffix; everything else goes to LibreOffice
+_HANDLERS = {
+    '.txt': _convert_txt,
+    '.html': _convert_html,
+    '.htm': _convert_html,
+}
+
 def convert_to_pdf(input_path: Union[str, Path], output_path: Optional[Union[str, Path]] = None) -> Path:
     """Main conversion entry point"""
     try:
@@ -384,27 +629,15 @@ def convert_to_pdf(input_path: Union[str, Path], output_path: Optional[Union[str
         _validate_file(input_path)
         logger.info(f"Converting {input_path.name} to PDF...")
 
-        if input_path.suffix.lower() == '.txt':
-            html_path = _create_temp_html(input_path)
-            try:
-                if Path(Config.WKHTMLTOPDF_PATH).exists():
-                    convert_with_wkhtmltopdf(html_path, output_path)
-                else:
-                    convert_with_libreoffice(html_path, output_path)
-            finally:
-                html_path.unlink(missing_ok=True)
-
-        elif input_path.suffix.lower() in ('.html', '.htm'):
-            if Path(Config.WKHTMLTOPDF_PATH).exists():
-                convert_with_wkhtmltopdf(input_path, output_path)
-            else:
-                convert_with_libreoffice(input_path, output_path)
-
-        else:
-            convert_with_libreoffice(input_path, output_path)
-            generated_pdf = output_path.parent / f"{input_path.stem}.pdf"
-            if generated_pdf != output_path:
-                shutil.move(str(generated_pdf), str(output_path))
+        handler = _HANDLERS.get(input_path.suffix.lower(), convert_with_libreoffice)
+        # Converters write their output in place, which would also rewrite a cached PDF hard-linked
+        # at output_path; they get a fresh name that then replaces it
+        partial_path = output_path.with_name(f"{output_path.stem}.{uuid.uuid4().hex}.part.pdf")
+        try:
+            handler(input_path, partial_path)
+            os.replace(partial_path, output_path)
+        finally:
+            partial_path.unlink(missing_ok=True)
 
         logger.info(f"Conversion complete: {output_path}")
         return output_path
@@ -418,4 +651,19 @@ def convert_to_pdf(input_path: Union[str, Path], output_path: Optional[Union[str
         raise
     except Exception as e:
         logger.exception(f"Unexpected error during conversion: {str(e)}")
-        raise ConversionError(f"Unexpected error: {str(e)}")
\ No newline at end of file
+        raise ConversionError(f"Unexpected error: {str(e)}")
+
+async def convert_to_pdf_async(input_path: Union[str, Path], output_path: Optional[Union[str, Path]] = None) -> Path:
+    """convert_to_pdf for asyncio callers; the blocking conversion runs on a worker thread"""
+    return await asyncio.to_thread(convert_to_pdf, input_path, output_path)
+
+def convert_many(inputs: Iterable[Union[str, Path]], max_workers: Optional[int] = None) -> Iterator[Tuple[Path, Union[Path, ConversionError]]]:
+    """Convert several files concurrently, yielding (input, output path or error) as each one finishes"""
+    with ThreadPoolExecutor(max_workers=max_workers or Config.LIBREOFFICE_WORKERS,
+                            thread_name_prefix='convert-many') as executor:
+        futures = {executor.submit(convert_to_pdf, path): Path(path) for path in inputs}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except ConversionError as e:
+                yield futures[future], e
\ No newline at end of file
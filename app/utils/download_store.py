@@ -0,0 +1,108 @@
+import threading
+import time
+from typing import Optional
+
+try:
+    import redis
+except ImportError:  # Only needed when REDIS_URL is configured
+    redis = None
+
+
+class MemoryDownloadStore:
+    """Process-local download records; only valid with a single web process"""
+    shared = False
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def create(self, download_id: str, filename: str) -> None:
+        with self._lock:
+            self._records[download_id] = {
+                'filename': filename,
+                'status': 'processing',
+                'message': 'Conversion in progress...'
+            }
+
+    def get(self, download_id: str) -> Optional[dict]:
+        with self._lock:
+            record = self._records.get(download_id)
+            return dict(record) if record else None
+
+    def update(self, download_id: str, **fields) -> None:
+        with self._lock:
+            if download_id in self._records:
+                self._records[download_id].update(fields)
+                self._changed.notify_all()
+
+    def wait(self, download_id: str, timeout: float) -> Optional[dict]:
+        """Block until the download leaves 'processing' or timeout passes; returns the record"""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self._records.get(download_id, {}).get('status') != 'processing', timeout
+            )
+            record = self._records.get(download_id)
+            return dict(record) if record else None
+
+
+class RedisDownloadStore:
+    """Download records kept in Redis hashes so every web worker and Celery task sees them"""
+    shared = True
+
+    def __init__(self, url: str, ttl: int, max_connections: int):
+        if redis is None:
+            raise RuntimeError("REDIS_URL is set but the redis package is not installed")
+        pool = redis.BlockingConnectionPool.from_url(
+            url, max_connections=max_connections, timeout=5, decode_responses=True
+        )
+        self._redis = redis.Redis(connection_pool=pool)
+        self._ttl = ttl
+
+    @staticmethod
+    def _key(download_id: str) -> str:
+        return f"dl:{download_id}"
+
+    @staticmethod
+    def _channel(download_id: str) -> str:
+        return f"downloads:{download_id}"
+
+    def create(self, download_id: str, filename: str) -> None:
+        self.update(download_id, filename=filename, status='processing', message='Conversion in progress...')
+
+    def get(self, download_id: str) -> Optional[dict]:
+        return self._redis.hgetall(self._key(download_id)) or None
+
+    def update(self, download_id: str, **fields) -> None:
+        key = self._key(download_id)
+        with self._redis.pipeline() as pipe:
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, self._ttl)
+            pipe.publish(self._channel(download_id), fields.get('status', ''))
+            pipe.execute()
+
+    def wait(self, download_id: str, timeout: float) -> Optional[dict]:
+        """Block until an update is published for the download or timeout passes; returns the record"""
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(self._channel(download_id))
+            # Re-read after subscribing so an update published in between is not missed
+            record = self.get(download_id)
+            if record is None or record.get('status') != 'processing':
+                return record
+            # The first read returns the SUBSCRIBE acknowledgement (filtered to None), so
+            # keep reading until a real update arrives or the time is up
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or pubsub.get_message(timeout=remaining) is not None:
+                    break
+            return self.get(download_id)
+        finally:
+            pubsub.close()
+
+
+def create_download_store(config):
+    if config.REDIS_URL:
+        return RedisDownloadStore(config.REDIS_URL, config.DOWNLOAD_TTL, config.REDIS_MAX_CONNECTIONS)
+    return MemoryDownloadStore()
@@ -1,35 +1,203 @@
-from pathlib import Path
 from flask import current_app
 import os
+import sys
+import queue
+import tempfile
+import hashlib
+import shutil
+import time
+
+# Reusable upload buffers; reads start at one page (8 KiB on Windows) and
+# double up to the buffer size
+_BUF_POOL = queue.SimpleQueue()
+_MIN_CHUNK = 8192 if os.name == 'nt' else 4096
+_MAX_CHUNK = 1024 * 1024
+
+def _stream_size(stream):
+    """Size of a seekable upload stream, or None"""
+    try:
+        pos = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(pos)
+        return size - pos
+    except (AttributeError, OSError):
+        return None
+
+def _backing_fileno(stream):
+    """File descriptor of a disk-backed upload stream, without forcing an in-memory spool to disk"""
+    if isinstance(stream, tempfile.SpooledTemporaryFile) and not stream._rolled:
+        return None
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError):
+        return None
+
+# In-kernel file-to-file copies, best first: (src_fd, dst_fd, count, src_offset) -> bytes copied.
+# sendfile only accepts a regular file as destination on Linux.
+_KERNEL_COPIES = []
+if hasattr(os, 'copy_file_range'):
+    _KERNEL_COPIES.append(lambda src, dst, count, offset: os.copy_file_range(src, dst, count, offset))
+if sys.platform.startswith('linux') and hasattr(os, 'sendfile'):
+    _KERNEL_COPIES.append(lambda src, dst, count, offset: os.sendfile(dst, src, offset, count))
+
+def _copy_in_kernel(src_fd, dst_fd, offset, size):
+    """Copy up to size bytes between files without passing them through user space"""
+    copied = 0
+    for copy in _KERNEL_COPIES:
+        try:
+            while copied < size:
+                n = copy(src_fd, dst_fd, size - copied, offset + copied)
+                if n == 0:
+                    break
+                copied += n
+            break
+        except OSError:
+            continue  # e.g. EXDEV or ENOSYS; try the next method from where this one stopped
+    return copied  # the caller copies any remainder
+
+def hash_upload(path):
+    """SHA-256 of a file on disk"""
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):
+            # Python 3.11+: large readinto chunks straight into OpenSSL's SHA-256
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        digest = hashlib.sha256()
+        for block in iter(lambda: f.read(_MAX_CHUNK), b''):
+            digest.update(block)
+        return digest.hexdigest()
 
 def save_uploaded_file(file, filename):
+    """Stream an upload to disk through a pooled buffer; returns the path and its SHA-256"""
     upload_path = current_app.config['UPLOAD_FOLDER'] / filename
-    file.save(upload_path)
-    return upload_path
+    part_path = upload_path.with_name(upload_path.name + '.part')
+    try:
+        buf = _BUF_POOL.get_nowait()
+    except queue.Empty:
+        buf = bytearray(_MAX_CHUNK)
+    view = memoryview(buf)
+    digest = hashlib.sha256()
+    copied = 0
+    completed = False
+
+    fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o600)
+    try:
+        size = _stream_size(file.stream)
+        if size and hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, size)
+
+        # Large uploads are already spooled to a temp file; let the kernel copy them
+        src_fd = _backing_fileno(file.stream)
+        if size and src_fd is not None and _KERNEL_COPIES:
+            offset = file.stream.tell()
+            copied = _copy_in_kernel(src_fd, fd, offset, size)
+            file.stream.seek(offset + copied)
+
+        chunk = _MIN_CHUNK
+        while True:
+            n = file.stream.readinto(view[:chunk])
+            if not n:
+                break
+            digest.update(view[:n])
+            written = 0
+            while written < n:
+                written += os.write(fd, view[written:n])
+            chunk = min(chunk * 2, _MAX_CHUNK)
+        completed = True
+    finally:
+        os.close(fd)
+        view.release()
+        _BUF_POOL.put(buf)
+        if not completed:
+            part_path.unlink(missing_ok=True)
 
-def cleanup_file(filepath):
-    """Safely remove a file"""
+    # The final name only appears once every byte is written, so readers never see a partial upload
+    os.replace(part_path, upload_path)
+
+    # Kernel-copied bytes never passed through the buffer; hash them from the page cache
+    return upload_path, hash_upload(upload_path) if copied else digest.hexdigest()
+
+def _cached_pdf_path(cache_key):
+    return current_app.config['PDF_CACHE_FOLDER'] / f"{cache_key}.pdf"
+
+def _link_or_copy(src, dst):
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def restore_cached_pdf(cache_key, pdf_path):
+    """Place a previously converted PDF for identical input at pdf_path; False on a cache miss"""
+    cached = _cached_pdf_path(cache_key)
+    try:
+        _link_or_copy(cached, pdf_path)
+    except FileNotFoundError:
+        return False
+    # Restarts the age sweep for the download and moves the entry to the young end of the cache
+    os.utime(pdf_path)
+    current_app.logger.info(f"Reusing cached conversion {cached.name}")
+    return True
+
+def cache_pdf(pdf_path, cache_key):
+    """Keep a converted PDF keyed by its input content, evicting the oldest entries"""
+    cache_folder = current_app.config['PDF_CACHE_FOLDER']
     try:
-        if filepath.exists():
-            filepath.unlink()
-            current_app.logger.info(f"Deleted temporary file: {filepath}")
-        else:
-            current_app.logger.info(f"File not found for cleanup: {filepath}")
+        _link_or_copy(pdf_path, _cached_pdf_path(cache_key))
+        entries = sorted(cache_folder.glob("*.pdf"), key=lambda p: p.stat().st_mtime)
+        for stale in entries[:max(len(entries) - current_app.config['PDF_CACHE_MAX_ENTRIES'], 0)]:
+            stale.unlink(missing_ok=True)
     except Exception as e:
+        current_app.logger.error(f"Error caching {pdf_path}: {e}")
+
+def cleanup_file(filepath, dir_fd=None):
+    """Safely remove a file; with dir_fd, filepath is relative to that open directory"""
+    try:
+        os.unlink(filepath, dir_fd=dir_fd)
+        current_app.logger.info(f"Deleted temporary file: {filepath}")
+    except FileNotFoundError:
+        current_app.logger.info(f"File not found for cleanup: {filepath}")
+    except OSError as e:
         current_app.logger.error(f"Error deleting file {filepath}: {e}")
 
-def cleanup_folder(folder_path):
-    """Clean all files inside a given folder"""
+_UNLINK_AT = os.unlink in os.supports_dir_fd and os.scandir in os.supports_fd
+
+def _is_stale(entry, cutoff):
+    if cutoff is None:
+        return True
     try:
-        for file in Path(folder_path).glob("*"):
-            if file.is_file():
-                cleanup_file(file)
+        return entry.stat(follow_symlinks=False).st_mtime < cutoff
+    except FileNotFoundError:
+        return False
+
+def cleanup_folder(folder_path, max_age=None):
+    """Clean all files inside a given folder, or only those unmodified for max_age seconds"""
+    cutoff = time.time() - max_age if max_age is not None else None
+    try:
+        if _UNLINK_AT:
+            # unlinkat on an open directory skips the kernel's path walk for every file
+            fd = os.open(folder_path, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+            try:
+                with os.scandir(fd) as entries:
+                    for entry in entries:
+                        if entry.is_file(follow_symlinks=False) and _is_stale(entry, cutoff):
+                            cleanup_file(entry.name, dir_fd=fd)
+            finally:
+                os.close(fd)
+            return
+
+        # DirEntry.is_file uses the type from the directory listing, so no stat per entry
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and _is_stale(entry, cutoff):
+                    cleanup_file(entry.path)
     except Exception as e:
         current_app.logger.error(f"Error cleaning folder {folder_path}: {e}")
 
 def cleanup_all_temp_folders():
-    """Clean up files in uploads, converted, and temp folders"""
+    """Clean up files in uploads, converted, and temp folders that outlived DOWNLOAD_TTL"""
+    # Anything younger may still be queued for conversion or waiting to be downloaded
+    max_age = current_app.config['DOWNLOAD_TTL']
     for folder_name in ['UPLOAD_FOLDER', 'CONVERTED_FOLDER', 'TEMP_FOLDER']:
         folder_path = current_app.config[folder_name]
         current_app.logger.info(f"Cleaning folder: {folder_path}")
-        cleanup_folder(folder_path)
+        cleanup_folder(folder_path, max_age)
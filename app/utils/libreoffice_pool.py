@@ -0,0 +1,325 @@
+import os
+import queue
+import signal
+import socket
+import subprocess
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from app.config import Config
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:  # LibreOffice's Python bridge is not available
+    uno = None
+
+logger = logging.getLogger(__name__)
+
+# Export filter per document service; anything else is exported as a text document
+_PDF_FILTERS = (
+    ("com.sun.star.sheet.SpreadsheetDocument", "calc_pdf_Export"),
+    ("com.sun.star.presentation.PresentationDocument", "impress_pdf_Export"),
+    ("com.sun.star.drawing.DrawingDocument", "draw_pdf_Export"),
+    ("com.sun.star.text.WebDocument", "writer_web_pdf_Export"),
+)
+
+
+class PoolError(Exception):
+    """Raised when a pooled listener cannot complete a conversion"""
+
+
+class ListenerCrashed(PoolError):
+    """Raised when the listener process died mid-conversion for a reason other than the timeout"""
+
+
+def _free_port(host: str) -> int:
+    """Ask the OS for an unused TCP port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def _property(name, value):
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+class _Listener:
+    """A headless soffice process accepting UNO connections on a local socket"""
+
+    def __init__(self, index: int, host: str, profile_prefix: str = ""):
+        self.index = index
+        self.host = host
+        self.port = None
+        self.profile = Config.LIBREOFFICE_PROFILE_DIR / f"{profile_prefix}worker_{index}"
+        self.process = None
+        self.generation = 0
+
+    def launch(self) -> None:
+        self.profile.mkdir(parents=True, exist_ok=True)
+        self.port = _free_port(self.host)
+        self.generation += 1
+
+        env = os.environ.copy()
+        env["SAL_USE_VCLPLUGIN"] = Config.SAL_USE_VCLPLUGIN
+
+        command = [
+            Config.LIBREOFFICE_PATH,
+            "--headless",
+            "--invisible",
+            "--nologo",
+            "--norestore",
+            "--nodefault",
+            "--nolockcheck",
+            f"--accept=socket,host={self.host},port={self.port};urp;StarOffice.ServiceManager",
+            f"-env:UserInstallation={self.profile.as_uri()}",
+        ]
+
+        logger.info(f"Starting LibreOffice listener {self.index} on port {self.port}")
+        self.process = subprocess.Popen(
+            command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            env=env
+        )
+
+    def wait_ready(self, timeout: int) -> bool:
+        """Block until the listener accepts connections or exits"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.is_alive():
+                return False
+            try:
+                with socket.create_connection((self.host, self.port), timeout=1):
+                    return True
+            except OSError:
+                time.sleep(0.25)
+        return False
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def kill(self) -> None:
+        if self.is_alive():
+            try:
+                # soffice.bin is a child of the launcher in the listener's own session
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except Exception:
+                self.process.kill()  # no process groups (Windows)
+            try:
+                self.process.wait(timeout=5)
+            except Exception:
+                pass
+
+    def convert(self, input_path: Path, output_path: Path, timeout: int) -> None:
+        """Load the document in the listener and export it as PDF"""
+        # A hung render would block this thread forever; killing the listener
+        # disposes the bridge and makes the pending UNO call raise.
+        timer = threading.Timer(timeout, self.kill)
+        timer.daemon = True
+        timer.start()
+        try:
+            local_ctx = uno.getComponentContext()
+            resolver = local_ctx.ServiceManager.createInstanceWithContext(
+                "com.sun.star.bridge.UnoUrlResolver", local_ctx
+            )
+            ctx = resolver.resolve(
+                f"uno:socket,host={self.host},port={self.port};urp;StarOffice.ComponentContext"
+            )
+            desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+            document = desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(str(input_path)), "_blank", 0,
+                (_property("Hidden", True), _property("ReadOnly", True))
+            )
+            if document is None:
+                raise PoolError(f"LibreOffice could not open {input_path.name}")
+
+            try:
+                filter_name = next(
+                    (name for service, name in _PDF_FILTERS if document.supportsService(service)),
+                    "writer_pdf_Export"
+                )
+                document.storeToURL(
+                    uno.systemPathToFileUrl(str(output_path)),
+                    (_property("FilterName", filter_name),)
+                )
+            finally:
+                document.close(True)
+
+        except PoolError:
+            raise
+        except Exception as e:
+            if not timer.is_alive():
+                raise PoolError(f"LibreOffice listener timed out after {timeout} seconds") from e
+            if not self.is_alive():
+                raise ListenerCrashed(f"LibreOffice listener {self.index} crashed: {str(e)}") from e
+            raise PoolError(f"LibreOffice listener conversion failed: {str(e)}") from e
+        finally:
+            timer.cancel()
+
+
+class ProfilePool:
+    """Persistent LibreOffice profiles reused by standalone soffice conversions"""
+
+    def __init__(self, first_index: int, size: int, profile_prefix: str = ""):
+        self._idle = queue.Queue()
+        for i in range(first_index, first_index + size):
+            self._idle.put(Config.LIBREOFFICE_PROFILE_DIR / f"{profile_prefix}cli_{i}")
+
+    @contextmanager
+    def acquire(self, timeout: int):
+        try:
+            profile = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolError("No LibreOffice profile became available")
+        try:
+            profile.mkdir(parents=True, exist_ok=True)
+            yield profile
+        finally:
+            self._idle.put(profile)
+
+    def warm(self) -> None:
+        """Initialise every profile in the background so first conversions start warm"""
+        def seed():
+            for _ in range(self._idle.qsize()):
+                with self.acquire(Config.LIBREOFFICE_STARTUP_TIMEOUT) as profile:
+                    # soffice creates the user installation under <profile>/user on first start
+                    if (profile / "user").exists():
+                        continue
+                    env = os.environ.copy()
+                    env["SAL_USE_VCLPLUGIN"] = Config.SAL_USE_VCLPLUGIN
+                    try:
+                        subprocess.run(
+                            [Config.LIBREOFFICE_PATH, "--headless", "--nologo", "--norestore",
+                             "--terminate_after_init", f"-env:UserInstallation={profile.as_uri()}"],
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL,
+                            timeout=Config.LIBREOFFICE_STARTUP_TIMEOUT,
+                            env=env
+                        )
+                    except Exception as e:
+                        logger.warning(f"Could not warm LibreOffice profile {profile.name}: {e}")
+
+        threading.Thread(target=seed, name="lo-profile-warmup", daemon=True).start()
+
+
+class ListenerPool:
+    """Pre-warmed pool of LibreOffice listeners driven over UNO"""
+
+    def __init__(self, size: int, host: str = "127.0.0.1", first_index: int = 0, profile_prefix: str = ""):
+        self.size = size
+        self.host = host
+        self.first_index = first_index
+        # Keeps profiles of pools in different kinds of process (e.g. Celery) apart
+        self.profile_prefix = profile_prefix
+        self._listeners = []
+        self._idle = queue.Queue()
+        self._running = threading.Event()
+        self._watchdog = None
+        # Warm profiles for the CLI fallback when UNO is not importable
+        self.profiles = None
+
+    @staticmethod
+    def available() -> bool:
+        """True when both the UNO bridge and the soffice binary are usable"""
+        return uno is not None and Path(Config.LIBREOFFICE_PATH).exists()
+
+    def is_running(self) -> bool:
+        return self._running.is_set()
+
+    def is_reachable(self) -> bool:
+        """True while at least one listener process is up (possibly still starting)"""
+        return self.is_running() and any(listener.is_alive() for listener in self._listeners)
+
+    def start(self) -> bool:
+        """Launch the listeners in the background; returns False if pooling is unavailable"""
+        if self.is_running():
+            return True
+        if self.size < 1 or not self.available():
+            logger.info("LibreOffice listener pool disabled, using per-conversion soffice")
+            if self.size >= 1 and self.profiles is None and Path(Config.LIBREOFFICE_PATH).exists():
+                self.profiles = ProfilePool(self.first_index, self.size, self.profile_prefix)
+                self.profiles.warm()
+            return False
+
+        self._listeners = [
+            _Listener(i, self.host, self.profile_prefix) for i in range(self.first_index, self.first_index + self.size)
+        ]
+        self._running.set()
+        for listener in self._listeners:
+            threading.Thread(
+                target=self._bring_up, args=(listener,),
+                name=f"lo-listener-{listener.index}", daemon=True
+            ).start()
+
+        self._watchdog = threading.Thread(target=self._watch, name="lo-watchdog", daemon=True)
+        self._watchdog.start()
+        return True
+
+    def stop(self) -> None:
+        self._running.clear()
+        for listener in self._listeners:
+            listener.kill()
+
+    def _bring_up(self, listener: _Listener) -> None:
+        try:
+            listener.launch()
+        except Exception as e:
+            logger.error(f"Failed to launch LibreOffice listener {listener.index}: {e}")
+            return
+        if listener.wait_ready(Config.LIBREOFFICE_STARTUP_TIMEOUT):
+            self._idle.put((listener, listener.generation))
+        else:
+            logger.error(f"LibreOffice listener {listener.index} did not become ready")
+            listener.kill()
+
+    def _watch(self) -> None:
+        """Restart listeners that crashed or were killed after a timeout"""
+        while self._running.is_set():
+            time.sleep(Config.LIBREOFFICE_WATCHDOG_INTERVAL)
+            for listener in self._listeners:
+                if self._running.is_set() and listener.process is not None and not listener.is_alive():
+                    logger.warning(f"LibreOffice listener {listener.index} exited, restarting")
+                    listener.process = None
+                    self._bring_up(listener)
+
+    def _checkout(self, deadline: float):
+        while True:
+            try:
+                listener, generation = self._idle.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise PoolError("No LibreOffice listener became available")
+            # Entries left behind by a listener that has since died or been restarted are stale
+            if generation == listener.generation and listener.is_alive():
+                return listener, generation
+
+    def convert(self, input_path: Path, output_path: Path, timeout: Optional[int] = None) -> None:
+        """Run one conversion on the next idle listener, retrying once if that listener crashes"""
+        timeout = timeout or Config.LIBREOFFICE_TIMEOUT
+        deadline = time.monotonic() + timeout
+        for attempt in range(2):
+            listener, generation = self._checkout(deadline)
+            try:
+                listener.convert(input_path, output_path, timeout)
+                return
+            except ListenerCrashed as e:
+                # The watchdog respawns the dead listener; the retry takes whichever is idle first
+                if attempt:
+                    raise
+                logger.warning(f"{e}; retrying {input_path.name} once")
+            finally:
+                # Dead listeners are re-queued by the watchdog once restarted
+                if listener.is_alive():
+                    self._idle.put((listener, generation))
+
+
+listener_pool = ListenerPool(Config.LIBREOFFICE_WORKERS)
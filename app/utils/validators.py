@@ -1,6 +1,8 @@
-from flask import current_app
+from app.config import Config
+
+_ALLOWED = frozenset(Config.ALLOWED_EXTENSIONS)
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
\ No newline at end of file
+    i = filename.rfind('.')
+    return i != -1 and filename[i + 1:].lower() in _ALLOWED
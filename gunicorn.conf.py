@@ -0,0 +1,39 @@
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Download records are process-local unless REDIS_URL is set, so only scale
+# out to several workers when they can share state.
+workers = int(os.environ.get('GUNICORN_WORKERS', 4 if os.environ.get('REDIS_URL') else 1))
+
+# Threads keep slow uploads from blocking other clients on the same worker
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# send_file hands PDFs to wsgi.file_wrapper, which gunicorn serves with sendfile(2)
+sendfile = True
+
+
+def pre_fork(server, worker):
+    # Give each worker a stable slot so its LibreOffice listeners reuse the same profiles
+    taken = {getattr(w, 'listener_slot', None) for w in server.WORKERS.values()}
+    worker.listener_slot = next(i for i in range(len(taken) + 1) if i not in taken)
+
+
+def post_worker_init(worker):
+    from app import app, init_converters
+    # Celery workers run the conversions; web workers only dispatch them
+    if app.config['CELERY_BROKER_URL']:
+        return
+    pool = app.libreoffice_pool
+    # LIBREOFFICE_WORKERS and MAX_QUEUED_CONVERSIONS are totals for the host, shared out between the workers
+    pool.size = max(app.config['LIBREOFFICE_WORKERS'] // worker.cfg.workers, 1)
+    init_converters(pool.size, app.config['MAX_QUEUED_CONVERSIONS'] // worker.cfg.workers)
+    pool.first_index = worker.listener_slot * pool.size
+    pool.start()
+
+
+def worker_exit(server, worker):
+    from app import app
+    app.libreoffice_pool.stop()
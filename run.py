@@ -1,4 +1,8 @@
+import os
 from app import app
 
 if __name__ == '__main__':
+    # With the debug reloader only the serving child process owns the listeners
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        app.libreoffice_pool.start()
     app.run(host='0.0.0.0', debug=True)